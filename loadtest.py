@@ -0,0 +1,385 @@
+"""
+Load-test harness for the /format endpoint.
+
+Starts the FastAPI app locally under uvicorn with upload_pdf_to_supabase swapped
+for a local-disk stand-in, drives a mix of synthetic manuscripts at each
+concurrency level and reports throughput, latency percentiles, error rate and
+peak memory per worker. With --render-workers N the app runs in queue mode
+against a SQLite broker and N render_worker processes do the rendering; latency
+is then measured until the job is done.
+
+Example:
+    python loadtest.py --concurrency 1,4,8 --requests 24 --mix small=3,large=1 --workers 2
+    python loadtest.py --json results.json   # save for comparing versions
+    python loadtest.py --render-workers 4 --concurrency 8
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (chapters, paragraphs per chapter)
+MANUSCRIPT_PROFILES = {
+    "small": (3, 20),
+    "medium": (10, 40),
+    "large": (30, 60),
+}
+
+_WORDS = (
+    "the quick brown fox jumps over a lazy dog while lorem ipsum dolor sit amet "
+    "consectetur adipiscing elit chapter story margin gutter typeset paperback"
+).split()
+
+
+# ---------------------------------------------------------------------------
+# Server side (runs inside the uvicorn worker processes)
+# ---------------------------------------------------------------------------
+
+def local_upload_stand_in(pdf_path, pdf_filename):
+    """Replacement for upload_pdf_to_supabase: copies the PDF to LOADTEST_STORAGE_DIR."""
+    storage_dir = os.environ["LOADTEST_STORAGE_DIR"]
+    target = os.path.join(storage_dir, pdf_filename)
+    shutil.copyfile(pdf_path, target)
+    return f"file://{target}"
+
+
+def build_app():
+    """uvicorn app factory: the real app with storage swapped for local disk."""
+    import main
+    main.upload_pdf_to_supabase = local_upload_stand_in
+    return main.app
+
+
+def run_render_worker():
+    """
+    Entry point for render worker subprocesses, with the same storage stand-in.
+    Touches LOADTEST_READY_DIR/<pid> once the worker is warmed up and about to claim.
+    """
+    import render_worker
+    from utils import get_broker
+
+    def mark_ready():
+        ready_path = os.path.join(os.environ["LOADTEST_READY_DIR"], str(os.getpid()))
+        open(ready_path, "w").close()
+
+    render_worker.run_worker(
+        get_broker(), upload=local_upload_stand_in, poll_interval=0.1, on_ready=mark_ready
+    )
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+def make_manuscript(path, chapters, paragraphs, seed=0):
+    """
+    Writes a synthetic .docx with headings, styled body runs and bullet lists.
+    """
+    from docx import Document
+
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_paragraph("Synthetic Manuscript", style="Title")
+    for ch in range(chapters):
+        doc.add_heading(f"Chapter {ch + 1}", level=1)
+        for _ in range(paragraphs):
+            para = doc.add_paragraph()
+            for j in range(rng.randint(40, 160)):
+                run = para.add_run(rng.choice(_WORDS) + " ")
+                run.bold = j % 17 == 0
+                run.italic = j % 23 == 0
+        for _ in range(3):
+            doc.add_paragraph(" ".join(rng.choices(_WORDS, k=6)), style="List Bullet")
+    doc.save(path)
+
+
+def parse_mix(spec):
+    """'small=3,large=1' -> [('small', 3), ('large', 1)]"""
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in MANUSCRIPT_PROFILES:
+            raise ValueError(f"Unknown manuscript profile: {name}")
+        mix.append((name, int(weight or 1)))
+    return mix
+
+
+def _encode_multipart(fields, file_field, file_name, file_bytes):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for key, value in fields.items():
+        lines.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode()
+        )
+    lines.append(
+        (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+            f'filename="{file_name}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        + file_bytes
+        + b"\r\n"
+    )
+    lines.append(f"--{boundary}--\r\n".encode())
+    return b"".join(lines), f"multipart/form-data; boundary={boundary}"
+
+
+def _wait_for_job(base_url, job_id, deadline):
+    while time.perf_counter() < deadline:
+        with urllib.request.urlopen(f"{base_url}/jobs/{job_id}", timeout=30) as response:
+            payload = json.loads(response.read())
+        if payload["status"] in ("done", "failed"):
+            return payload
+        time.sleep(0.1)
+    return {"error": "timed out waiting for render job"}
+
+
+def send_format_request(url, manuscript_bytes, fields, timeout):
+    """Returns (ok, seconds, error message). Queued jobs are polled until finished."""
+    body, content_type = _encode_multipart(fields, "file", "manuscript.docx", manuscript_bytes)
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = json.loads(response.read())
+        if "job_id" in payload:
+            base_url = url.rsplit("/", 1)[0]
+            payload = _wait_for_job(base_url, payload["job_id"], started + timeout)
+        ok, error = "pdf_url" in payload, payload.get("error")
+    except urllib.error.HTTPError as e:
+        ok, error = False, f"HTTP {e.code}"
+    except Exception as e:
+        ok, error = False, str(e)
+    return ok, time.perf_counter() - started, error
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _worker_pids(server_pid):
+    """uvicorn worker processes (children of the server), or the server itself."""
+    children = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid != server_pid:
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return children or [server_pid]
+
+
+def _peak_rss_mb(pid):
+    """Peak resident set size (VmHWM) from /proc; None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _subprocess_env(scratch_dir, render_workers):
+    storage_dir = os.path.join(scratch_dir, "storage")
+    os.makedirs(storage_dir, exist_ok=True)
+    env = dict(os.environ)
+    env["LOADTEST_STORAGE_DIR"] = storage_dir
+    env["PYTHONPATH"] = PROJECT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("RENDER_BROKER_URL", None)
+    if render_workers:
+        env["RENDER_BROKER_URL"] = f"sqlite://{os.path.join(scratch_dir, 'queue.db')}"
+        env["RENDER_SHARED_DIR"] = os.path.join(scratch_dir, "shared")
+        env["LOADTEST_READY_DIR"] = os.path.join(scratch_dir, "ready")
+        os.makedirs(env["LOADTEST_READY_DIR"], exist_ok=True)
+    return env
+
+
+def start_render_workers(count, scratch_dir, env):
+    """
+    Starts count render workers and waits until each has written its ready file,
+    so font registration and imports don't land in the first level's latencies.
+    """
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", "import loadtest; loadtest.run_render_worker()"],
+            cwd=scratch_dir, env=env, stdout=subprocess.DEVNULL,
+        )
+        for _ in range(count)
+    ]
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if any(worker.poll() is not None for worker in workers):
+            for worker in workers:
+                worker.terminate()
+            raise RuntimeError("a render worker exited during startup")
+        ready = set(os.listdir(env["LOADTEST_READY_DIR"])) if workers else set()
+        if all(str(worker.pid) in ready for worker in workers):
+            return workers
+        time.sleep(0.25)
+    for worker in workers:
+        worker.terminate()
+    raise RuntimeError("render workers did not become ready in time")
+
+
+def start_server(port, workers, scratch_dir, env):
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "loadtest:build_app", "--factory",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=scratch_dir,  # main.py writes its temp files relative to cwd
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return server
+        except Exception:
+            time.sleep(0.25)
+    server.terminate()
+    raise RuntimeError("uvicorn did not become ready in time")
+
+
+def run_level(url, manuscripts, mix, concurrency, total_requests, fields, timeout, seed):
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    plan = rng.choices(names, weights=weights, k=total_requests)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda name: send_format_request(url, manuscripts[name], fields, timeout), plan
+        ))
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for ok, seconds, _ in results if ok]
+    errors = [error for ok, _, error in results if not ok]
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": len(errors),
+        "error_rate": len(errors) / total_requests if total_requests else 0.0,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "elapsed_s": elapsed,
+        "sample_errors": sorted(set(str(e) for e in errors))[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the /format endpoint locally.")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=12, help="requests per level")
+    parser.add_argument("--mix", default="small=3,medium=1", help="profile=weight,...")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--render-workers", type=int, default=0,
+                        help="queue mode: number of render_worker processes (0 = render inline)")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trim-size", default="6x9")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    fields = {"trim_size": args.trim_size, "generate_toc": "true", "book_title": "Load Test"}
+
+    scratch_dir = tempfile.mkdtemp(prefix="kdp-loadtest-")
+    try:
+        manuscripts = {}
+        for name, _ in mix:
+            path = os.path.join(scratch_dir, f"{name}.docx")
+            chapters, paragraphs = MANUSCRIPT_PROFILES[name]
+            make_manuscript(path, chapters, paragraphs, seed=args.seed)
+            with open(path, "rb") as f:
+                manuscripts[name] = f.read()
+
+        env = _subprocess_env(scratch_dir, args.render_workers)
+        port = _free_port()
+        server = start_server(port, args.workers, scratch_dir, env)
+        render_workers = []
+        url = f"http://127.0.0.1:{port}/format"
+        try:
+            render_workers = start_render_workers(args.render_workers, scratch_dir, env)
+            results = []
+            for level in levels:
+                result = run_level(
+                    url, manuscripts, mix, level, args.requests, fields, args.timeout, args.seed
+                )
+                results.append(result)
+                print(
+                    f"c={level:<3} {result['throughput_rps']:.2f} req/s  "
+                    f"p50={result['p50_s']:.2f}s p95={result['p95_s']:.2f}s p99={result['p99_s']:.2f}s  "
+                    f"errors={result['errors']}/{result['requests']} ({result['error_rate']:.0%})"
+                )
+                for error in result["sample_errors"]:
+                    print(f"    ❌ {error}")
+            pids = _worker_pids(server.pid) + [p.pid for p in render_workers]
+            peak_memory = {str(pid): _peak_rss_mb(pid) for pid in pids}
+        finally:
+            for process in [server] + render_workers:
+                process.terminate()
+            for process in [server] + render_workers:
+                process.wait(timeout=30)
+
+        for pid, mb in peak_memory.items():
+            print(f"worker {pid}: peak RSS {mb:.1f} MB" if mb is not None else f"worker {pid}: peak RSS n/a")
+
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump({
+                    "mix": args.mix,
+                    "workers": args.workers,
+                    "render_workers": args.render_workers,
+                    "levels": results,
+                    "peak_rss_mb_per_worker": peak_memory,
+                }, f, indent=2)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from utils import (
     register_fonts,
     generate_pdf,
-    upload_pdf_to_supabase
+    upload_pdf_to_supabase,
+    get_broker
 )
 import os
 import uuid
@@ -11,6 +12,11 @@ from fastapi.responses import JSONResponse
 
 app = FastAPI()
 
+# Queue mode: set RENDER_BROKER_URL (redis://host:6379/0 across nodes, or
+# sqlite:///path/queue.db when API and workers share one host) and run
+# render_worker.py processes; /format then enqueues instead of rendering inline.
+render_broker = get_broker()
+
 # Set CORS for your frontend domain
 origins = [
     "https://kdpformatter.com",
@@ -43,11 +49,14 @@ async def format_book(
     book_subtitle: str = Form(""),
     author_name: str = Form(""),
     dedication: str = Form(""),
-    copyright_notice: str = Form("")
+    copyright_notice: str = Form(""),
+    optimize_output: bool = Form(True),
+    linearize: bool = Form(True)
 ):
     try:
         # Save uploaded file to a temp location
-        temp_dir = "tmp"
+        # (in queue mode this must be storage every render worker can read)
+        temp_dir = os.getenv("RENDER_SHARED_DIR", "tmp")
         os.makedirs(temp_dir, exist_ok=True)
         file_ext = os.path.splitext(file.filename)[-1].lower()
         if file_ext != ".docx":
@@ -56,14 +65,7 @@ async def format_book(
         with open(docx_path, "wb") as f:
             f.write(await file.read())
 
-        # Output PDF path
-        pdf_filename = f"{uuid.uuid4()}.pdf"
-        pdf_path = os.path.join(temp_dir, pdf_filename)
-
-        # Generate PDF with formatted content and new front matter
-        generate_pdf(
-            output_path=pdf_path,
-            manuscript_file_path=docx_path,
+        render_params = dict(
             heading_font=heading_font,
             body_font=body_font,
             heading_size=heading_size,
@@ -75,7 +77,27 @@ async def format_book(
             book_subtitle=book_subtitle,
             author_name=author_name,
             dedication=dedication,
-            copyright_notice=copyright_notice
+            copyright_notice=copyright_notice,
+            optimize_output=optimize_output,
+            linearize=linearize
+        )
+
+        if render_broker:
+            job_id = render_broker.enqueue({
+                "manuscript_file_path": os.path.abspath(docx_path),
+                "params": render_params,
+            })
+            return JSONResponse({"job_id": job_id, "status": "queued"}, status_code=202)
+
+        # Output PDF path
+        pdf_filename = f"{uuid.uuid4()}.pdf"
+        pdf_path = os.path.join(temp_dir, pdf_filename)
+
+        # Generate PDF with formatted content and new front matter
+        generate_pdf(
+            output_path=pdf_path,
+            manuscript_file_path=docx_path,
+            **render_params
         )
 
         # Upload PDF to Supabase and get URL
@@ -85,3 +107,17 @@ async def format_book(
     except Exception as e:
         print("Error:", e)
         return JSONResponse({"error": f"Formatting failed: {e}"}, status_code=500)
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    if not render_broker:
+        return JSONResponse({"error": "Render queue is not enabled."}, status_code=404)
+    job = render_broker.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job."}, status_code=404)
+    response = {"job_id": job["job_id"], "status": job["status"], "attempts": job["attempts"]}
+    if job["status"] == "done":
+        response["pdf_url"] = job["result"]["pdf_url"]
+    elif job["error"]:
+        response["error"] = job["error"]
+    return response
@@ -0,0 +1,118 @@
+"""
+Render worker for queue mode.
+
+Pulls jobs that /format enqueued (see RENDER_BROKER_URL), renders them with
+generate_pdf, uploads the result and marks the job done. Run as many of these
+as you like, on any node that can reach the broker and RENDER_SHARED_DIR:
+
+    RENDER_BROKER_URL=redis://queue-host:6379/0 python render_worker.py
+
+(sqlite:// brokers only work when every process runs on the same host.)
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from utils import register_fonts, generate_pdf, upload_pdf_to_supabase, get_broker
+from utils.render_queue import DEFAULT_VISIBILITY_TIMEOUT
+
+MAX_ERROR_BACKOFF = 30  # seconds between retries while the broker is unreachable
+
+
+def _keep_lease_alive(broker, job, visibility_timeout, stop):
+    # Renew well before the deadline so long renders aren't handed to another worker
+    while not stop.wait(visibility_timeout / 3):
+        try:
+            if not broker.extend(job, visibility_timeout):
+                print(f"⚠️ Lost lease on job {job.id}")
+                return
+        except Exception as e:
+            # Keep rendering; the next renewal may get through before the deadline
+            print(f"⚠️ Could not renew lease on job {job.id}: {e}")
+
+
+def process_job(broker, job, upload=upload_pdf_to_supabase, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """
+    Renders and uploads one job. The PDF name is derived from the job id, so a
+    retried or duplicated run overwrites the same object instead of adding one.
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_keep_lease_alive, args=(broker, job, visibility_timeout, stop), daemon=True
+    )
+    heartbeat.start()
+    try:
+        pdf_filename = f"{job.id}.pdf"
+        with tempfile.TemporaryDirectory(prefix="render-") as work_dir:
+            pdf_path = os.path.join(work_dir, pdf_filename)
+            generate_pdf(
+                output_path=pdf_path,
+                manuscript_file_path=job.payload["manuscript_file_path"],
+                **job.payload["params"]
+            )
+            pdf_url = upload(pdf_path, pdf_filename)
+        stop.set()
+        if not broker.complete(job, {"pdf_url": pdf_url}):
+            print(f"⚠️ Job {job.id} was already completed or re-claimed; result discarded")
+    except Exception as e:
+        stop.set()
+        print(f"❌ Job {job.id} attempt {job.attempts} failed: {e}")
+        try:
+            broker.fail(job, e)
+        except Exception as broker_error:
+            # The lease will expire and the job will be retried from there
+            print(f"⚠️ Could not record failure of job {job.id}: {broker_error}")
+    finally:
+        # Also reached on KeyboardInterrupt/SystemExit, which skip the branches above
+        stop.set()
+        heartbeat.join()
+
+
+def run_worker(broker, worker_id=None, upload=upload_pdf_to_supabase,
+               visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, poll_interval=0.5, on_ready=None):
+    """
+    Claims and processes jobs forever. Broker errors are logged and retried
+    with exponential backoff instead of killing the worker.
+    on_ready, if given, is called once fonts are registered and before the first claim.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    register_fonts()
+    print(f"✅ Render worker {worker_id} started")
+    if on_ready is not None:
+        on_ready()
+    error_backoff = poll_interval
+    while True:
+        try:
+            job = broker.claim(worker_id, visibility_timeout)
+            if job is not None:
+                process_job(broker, job, upload=upload, visibility_timeout=visibility_timeout)
+        except Exception as e:
+            print(f"⚠️ Render worker {worker_id} broker error: {e}; retrying in {error_backoff:.1f}s")
+            time.sleep(error_backoff)
+            error_backoff = min(error_backoff * 2, MAX_ERROR_BACKOFF)
+            continue
+        error_backoff = poll_interval
+        if job is None:
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued /format render jobs.")
+    parser.add_argument("--broker", default=None, help="broker URL (default: RENDER_BROKER_URL)")
+    parser.add_argument("--worker-id", default=None)
+    parser.add_argument("--visibility-timeout", type=float, default=DEFAULT_VISIBILITY_TIMEOUT)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    broker = get_broker(args.broker)
+    if broker is None:
+        raise SystemExit("Set RENDER_BROKER_URL or pass --broker.")
+    run_worker(
+        broker,
+        worker_id=args.worker_id,
+        visibility_timeout=args.visibility_timeout,
+        poll_interval=args.poll_interval,
+    )
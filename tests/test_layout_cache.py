@@ -0,0 +1,161 @@
+import io
+
+import pikepdf
+import pytest
+from docx import Document
+from reportlab import rl_config
+from reportlab.lib.enums import TA_JUSTIFY
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Spacer
+
+import utils.layout_cache as layout_cache
+from utils.pdf_gen import generate_pdf
+
+# Mixed markup plus an unbreakable URL, so split() has to pick between
+# the processed-frags and hard split strategies
+MIXED_TEXT = (
+    "Read more at <b>https://example.com/a/very/long/path/that/keeps/going/and/going/forever</b> "
+    "and then <i>some italic words</i> follow with plain text " * 6
+)
+
+
+@pytest.fixture(autouse=True)
+def invariant_pdfs(monkeypatch):
+    monkeypatch.setattr(rl_config, "invariant", 1)
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = layout_cache.LayoutCache()
+    monkeypatch.setattr(layout_cache, "_layout_cache", cache)
+    monkeypatch.setattr(layout_cache, "_layout_cache_configured", True)
+    return cache
+
+
+def _disable_cache(monkeypatch):
+    monkeypatch.setattr(layout_cache, "get_layout_cache", lambda: None)
+
+
+def _page_contents(pdf_bytes):
+    """
+    Per-page content streams, parsed and re-serialized. The cache only promises the
+    same drawing operators in the same places; the whitespace between operators
+    can differ from an uncached build, so raw bytes are not compared.
+    """
+    with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+        return [
+            pikepdf.unparse_content_stream(pikepdf.parse_content_stream(page))
+            for page in pdf.pages
+        ]
+
+
+def _render(offset):
+    style = ParagraphStyle("Body", fontName="Helvetica", fontSize=11, leading=13, alignment=TA_JUSTIFY)
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=(300, 260))
+    story = [Spacer(1, offset)] + [layout_cache.CachedParagraph(MIXED_TEXT, style) for _ in range(4)]
+    doc.build(story)
+    return buf.getvalue()
+
+
+def test_shifted_pagination_matches_uncached(fresh_cache, monkeypatch):
+    _render(0)
+    cached = _render(57)
+    assert fresh_cache.hits > 0
+
+    _disable_cache(monkeypatch)
+    assert _page_contents(cached) == _page_contents(_render(57))
+
+
+def test_generate_pdf_variant_matches_uncached(fresh_cache, monkeypatch, tmp_path):
+    manuscript = tmp_path / "book.docx"
+    doc = Document()
+    for chapter in range(3):
+        doc.add_heading(f"Chapter {chapter + 1}", level=1)
+        for _ in range(12):
+            para = doc.add_paragraph()
+            para.add_run("See https://example.com/docs/reference/chapter/section/appendix/index.html ")
+            para.add_run("for details. ").bold = True
+            para.add_run("Plain words fill out the rest of this paragraph nicely. " * 4)
+    doc.save(manuscript)
+
+    def render(name, heading_size):
+        path = tmp_path / name
+        generate_pdf(
+            output_path=str(path), manuscript_file_path=str(manuscript),
+            heading_font="Helvetica-Bold", body_font="Helvetica",
+            heading_size=heading_size, body_size=12, trim_size="6x9", bleed=False,
+            optimize_output=False,
+        )
+        return path.read_bytes()
+
+    render("warm.pdf", 18)
+    cached = render("cached.pdf", 22)
+    assert fresh_cache.hits > 0
+
+    _disable_cache(monkeypatch)
+    assert _page_contents(cached) == _page_contents(render("uncached.pdf", 22))
+
+
+def test_lru_evicts_to_stay_within_budget():
+    cache = layout_cache.LayoutCache(max_bytes=2048)
+    for i in range(20):
+        cache.put(f"k{i}", b"x" * 500, 0.0)
+    stats = cache.stats()
+    assert stats["bytes"] <= 2048
+    assert stats["evictions"] > 0
+    assert cache.get("k0") is None
+    assert cache.get("k19") == b"x" * 500
+
+
+def test_disk_tier_stays_within_budget(tmp_path):
+    cache = layout_cache.LayoutCache(disk_dir=str(tmp_path), disk_max_bytes=4096)
+    for i in range(40):
+        cache.put(f"k{i}", b"x" * 500, 0.0)
+    on_disk = sum(p.stat().st_size for p in tmp_path.glob("*.pkl"))
+    assert 0 < on_disk <= 4096
+    survivor = next(tmp_path.glob("*.pkl")).stem
+
+    # A new process sees the surviving entries
+    reopened = layout_cache.LayoutCache(disk_dir=str(tmp_path), disk_max_bytes=4096)
+    assert reopened.get(survivor) == b"x" * 500
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_saved_time_is_net_of_overhead(fresh_cache):
+    style = ParagraphStyle("Body", fontName="Helvetica", fontSize=11, leading=13)
+    layout_cache.CachedParagraph(MIXED_TEXT, style).wrap(300, 1000)
+
+    cold = fresh_cache.stats()
+    assert cold["misses"] == 1 and cold["hits"] == 0
+    assert cold["overhead_seconds"] > 0
+    # A cold build only pays: the report must show a loss, not zero
+    assert cold["saved_seconds"] < 0
+
+    layout_cache.CachedParagraph(MIXED_TEXT, style).wrap(300, 1000)
+    warm = fresh_cache.stats()
+    assert warm["hits"] == 1
+    assert warm["avoided_seconds"] == pytest.approx(cold["compute_seconds"])
+    assert warm["saved_seconds"] == pytest.approx(warm["avoided_seconds"] - warm["overhead_seconds"])
+
+
+@pytest.fixture
+def unconfigured(monkeypatch):
+    monkeypatch.setattr(layout_cache, "_layout_cache", None)
+    monkeypatch.setattr(layout_cache, "_layout_cache_configured", False)
+    monkeypatch.delenv("LAYOUT_CACHE_DIR", raising=False)
+    monkeypatch.delenv("LAYOUT_CACHE_DISK_MAX_MB", raising=False)
+
+
+def test_malformed_env_falls_back_to_default(unconfigured, monkeypatch, capsys):
+    monkeypatch.setenv("LAYOUT_CACHE_MAX_MB", "lots")
+    cache = layout_cache.get_layout_cache()
+    assert cache.max_bytes == layout_cache.DEFAULT_MAX_MB * 1024 * 1024
+    assert "Invalid LAYOUT_CACHE_MAX_MB" in capsys.readouterr().out
+
+
+def test_env_is_read_once(unconfigured, monkeypatch):
+    monkeypatch.setenv("LAYOUT_CACHE_MAX_MB", "0")
+    assert layout_cache.get_layout_cache() is None
+    monkeypatch.setenv("LAYOUT_CACHE_MAX_MB", "bad")
+    assert layout_cache.get_layout_cache() is None
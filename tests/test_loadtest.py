@@ -0,0 +1,45 @@
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import pytest
+
+import loadtest
+
+
+def test_parse_mix_weights_and_default():
+    assert loadtest.parse_mix("small=3, large") == [("small", 3), ("large", 1)]
+
+
+def test_parse_mix_rejects_unknown_profile():
+    with pytest.raises(ValueError, match="huge"):
+        loadtest.parse_mix("small=1,huge=2")
+
+
+def test_percentile_empty_is_zero():
+    assert loadtest.percentile([], 95) == 0.0
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1.0), (50, 3.0), (100, 5.0), (99, 5.0)])
+def test_percentile_boundary_ranks(pct, expected):
+    assert loadtest.percentile([5.0, 1.0, 4.0, 2.0, 3.0], pct) == expected
+
+
+def test_percentile_single_value():
+    assert loadtest.percentile([2.5], 0) == loadtest.percentile([2.5], 100) == 2.5
+
+
+def test_encode_multipart_round_trips():
+    body, content_type = loadtest._encode_multipart(
+        {"trim_size": "6x9", "book_title": "Load Test"}, "file", "manuscript.docx", b"PK\x03\x04\r\n--x"
+    )
+    assert content_type.startswith("multipart/form-data; boundary=")
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    parts = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+    assert list(parts) == ["trim_size", "book_title", "file"]
+    assert parts["trim_size"].get_content() == "6x9"
+    assert parts["book_title"].get_content() == "Load Test"
+    assert parts["file"].get_filename() == "manuscript.docx"
+    assert parts["file"].get_content() == b"PK\x03\x04\r\n--x"
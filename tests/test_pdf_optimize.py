@@ -0,0 +1,101 @@
+import pikepdf
+from reportlab.pdfgen import canvas
+
+from utils import pdf_optimize
+
+
+def _make_pdf(path, pages=3):
+    c = canvas.Canvas(str(path), pagesize=(300, 400))
+    for i in range(pages):
+        c.drawString(50, 350, f"Page {i + 1}")
+        c.showPage()
+    c.save()
+
+
+def test_optimize_linearizes_and_reports(tmp_path):
+    pdf_path = tmp_path / "book.pdf"
+    _make_pdf(pdf_path)
+
+    report = pdf_optimize.optimize_pdf(str(pdf_path))
+
+    assert report["optimized_bytes"] == pdf_path.stat().st_size
+    assert set(report["after"]) == {"fonts", "images", "content", "other"}
+    assert report["first_page_bytes"] <= report["optimized_bytes"]
+    with pikepdf.open(pdf_path) as pdf:
+        assert pdf.is_linearized
+        assert len(pdf.pages) == 3
+
+
+def test_save_failure_keeps_original(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "book.pdf"
+    _make_pdf(pdf_path)
+    original = pdf_path.read_bytes()
+
+    def broken_save(self, filename, **kwargs):
+        with open(filename, "wb") as f:
+            f.write(b"partial")
+        raise pikepdf.PdfError("qpdf blew up")
+
+    monkeypatch.setattr(pikepdf.Pdf, "save", broken_save)
+
+    assert pdf_optimize.optimize_pdf(str(pdf_path)) is None
+    assert pdf_path.read_bytes() == original
+    assert not (tmp_path / "book.pdf.opt").exists()
+
+
+def test_inspect_failure_after_save_returns_partial_report(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "book.pdf"
+    _make_pdf(pdf_path)
+    real_open = pikepdf.open
+    opened = []
+
+    def open_once(*args, **kwargs):
+        opened.append(args[0])
+        if len(opened) > 1:
+            raise pikepdf.PdfError("cannot reopen")
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(pikepdf, "open", open_once)
+
+    report = pdf_optimize.optimize_pdf(str(pdf_path))
+
+    assert report["optimized_bytes"] == pdf_path.stat().st_size
+    assert report["after"] is None and report["first_page_bytes"] is None
+    assert "breakdown unavailable" in pdf_optimize.format_optimize_report(report)
+    with real_open(pdf_path) as pdf:
+        assert pdf.is_linearized
+
+def _pdf_with_masked_images(path, masks):
+    """One page per mask, each drawing an image with the same data but its own /SMask."""
+    pdf = pikepdf.new()
+    for mask in masks:
+        smask = pikepdf.Stream(pdf, mask)
+        smask.Type, smask.Subtype = pikepdf.Name.XObject, pikepdf.Name.Image
+        smask.Width, smask.Height = 10, 30
+        smask.ColorSpace, smask.BitsPerComponent = pikepdf.Name.DeviceGray, 8
+        image = pikepdf.Stream(pdf, b"\x80" * 300)
+        image.Type, image.Subtype = pikepdf.Name.XObject, pikepdf.Name.Image
+        image.Width, image.Height = 10, 30
+        image.ColorSpace, image.BitsPerComponent = pikepdf.Name.DeviceGray, 8
+        image.SMask = smask
+        pdf.add_blank_page(page_size=(100, 100))
+        page = pdf.pages[-1]
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+        page.Contents = pdf.make_stream(b"q 10 0 0 30 0 0 cm /Im0 Do Q")
+    pdf.save(path)
+
+
+def test_dedup_keeps_images_with_different_masks(tmp_path):
+    pdf_path = tmp_path / "masks.pdf"
+    _pdf_with_masked_images(pdf_path, [b"\xff" * 100 + b"\x00" * 200, b"\xff" * 100 + b"\x80" * 200])
+
+    with pikepdf.open(pdf_path) as pdf:
+        assert pdf_optimize.deduplicate_resources(pdf) == 0
+
+
+def test_dedup_merges_images_with_identical_masks(tmp_path):
+    pdf_path = tmp_path / "masks.pdf"
+    _pdf_with_masked_images(pdf_path, [b"\xff" * 100 + b"\x00" * 200] * 2)
+
+    with pikepdf.open(pdf_path) as pdf:
+        assert pdf_optimize.deduplicate_resources(pdf) == 1
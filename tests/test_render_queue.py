@@ -0,0 +1,152 @@
+import pytest
+
+from utils import render_queue
+from utils.render_queue import RenderBroker, SQLiteBroker, RedisBroker, get_broker
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(render_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def broker(request, tmp_path, clock):
+    if request.param == "sqlite":
+        return SQLiteBroker(str(tmp_path / "queue.db"))
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisBroker(fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_duplicate_enqueue_is_a_noop(broker):
+    assert broker.enqueue({"v": 1}, job_id="j1") == "j1"
+    assert broker.enqueue({"v": 2}, job_id="j1") == "j1"
+
+    job = broker.claim("w1")
+    assert job.payload == {"v": 1}
+    assert broker.claim("w2") is None
+
+
+def test_claimed_job_is_invisible_until_lease_expires(broker, clock):
+    broker.enqueue({}, job_id="j1")
+    first = broker.claim("w1", visibility_timeout=30)
+    assert first.attempts == 1
+    assert broker.get("j1")["status"] == "running"
+
+    clock.advance(29)
+    assert broker.claim("w2", visibility_timeout=30) is None
+
+    clock.advance(2)
+    second = broker.claim("w2", visibility_timeout=30)
+    assert second.id == "j1"
+    assert second.attempts == 2
+    assert second.lease != first.lease
+
+
+def test_extend_keeps_lease_alive(broker, clock):
+    broker.enqueue({}, job_id="j1")
+    job = broker.claim("w1", visibility_timeout=30)
+
+    clock.advance(20)
+    assert broker.extend(job, visibility_timeout=30)
+    clock.advance(20)
+    assert broker.claim("w2") is None
+
+
+def test_stale_lease_cannot_complete_or_extend(broker, clock):
+    broker.enqueue({}, job_id="j1")
+    stale = broker.claim("w1", visibility_timeout=30)
+    clock.advance(31)
+    current = broker.claim("w2", visibility_timeout=30)
+
+    assert not broker.complete(stale, {"pdf_url": "stale"})
+    assert not broker.extend(stale)
+    assert not broker.fail(stale, "stale")
+    assert broker.get("j1")["status"] == "running"
+
+    assert broker.complete(current, {"pdf_url": "ok"})
+    assert not broker.complete(current, {"pdf_url": "again"})
+    status = broker.get("j1")
+    assert status["status"] == "done"
+    assert status["result"] == {"pdf_url": "ok"}
+
+
+def test_fail_retries_with_backoff(broker, clock):
+    broker.enqueue({}, job_id="j1", max_attempts=3)
+    job = broker.claim("w1")
+    assert broker.fail(job, "boom")
+    status = broker.get("j1")
+    assert status["status"] == "queued"
+    assert status["error"] == "boom"
+
+    clock.advance(render_queue.RETRY_BACKOFF - 1)
+    assert broker.claim("w1") is None
+    clock.advance(1)
+    retry = broker.claim("w1")
+    assert retry.attempts == 2
+
+    # Backoff grows with the attempt number
+    assert broker.fail(retry, "boom again")
+    clock.advance(render_queue.RETRY_BACKOFF * 2 - 1)
+    assert broker.claim("w1") is None
+    clock.advance(1)
+    assert broker.claim("w1").attempts == 3
+
+
+def test_fail_on_last_attempt_marks_failed(broker, clock):
+    broker.enqueue({}, job_id="j1", max_attempts=2)
+    assert broker.fail(broker.claim("w1"), "first")
+    clock.advance(render_queue.RETRY_BACKOFF)
+    assert broker.fail(broker.claim("w1"), "second")
+
+    clock.advance(3600)
+    assert broker.claim("w1") is None
+    status = broker.get("j1")
+    assert status["status"] == "failed"
+    assert status["attempts"] == 2
+    assert status["error"] == "second"
+
+
+def test_lease_expiry_on_last_attempt_marks_failed(broker, clock):
+    broker.enqueue({}, job_id="j1", max_attempts=1)
+    broker.claim("w1", visibility_timeout=30)
+
+    clock.advance(31)
+    assert broker.claim("w2") is None
+    status = broker.get("j1")
+    assert status["status"] == "failed"
+    assert status["error"] == "visibility timeout exceeded"
+
+
+def test_get_unknown_job(broker):
+    assert broker.get("missing") is None
+
+
+def test_incomplete_backend_fails_at_construction():
+    class HalfBroker(RenderBroker):
+        def enqueue(self, payload, job_id=None, max_attempts=3):
+            return "x"
+
+    with pytest.raises(TypeError):
+        HalfBroker()
+
+
+def test_get_broker_from_url(tmp_path, monkeypatch):
+    monkeypatch.delenv("RENDER_BROKER_URL", raising=False)
+    assert get_broker() is None
+    assert isinstance(get_broker(f"sqlite://{tmp_path / 'q.db'}"), SQLiteBroker)
+    assert isinstance(get_broker("redis://localhost:6379/0"), RedisBroker)
+    with pytest.raises(ValueError):
+        get_broker("amqp://localhost")
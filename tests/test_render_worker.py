@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+
+import pytest
+
+import render_worker
+from utils.render_queue import SQLiteBroker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SQLiteBroker(str(tmp_path / "queue.db"))
+
+
+def _enqueue(broker):
+    return broker.enqueue({"manuscript_file_path": "book.docx", "params": {"trim_size": "6x9"}})
+
+
+def test_process_job_uploads_and_completes(broker, monkeypatch):
+    rendered = {}
+
+    def fake_generate_pdf(output_path, manuscript_file_path, **params):
+        rendered.update(manuscript=manuscript_file_path, params=params)
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF")
+
+    monkeypatch.setattr(render_worker, "generate_pdf", fake_generate_pdf)
+    uploads = []
+    job_id = _enqueue(broker)
+
+    render_worker.process_job(
+        broker, broker.claim("w1"),
+        upload=lambda path, name: uploads.append(name) or f"https://cdn/{name}",
+    )
+
+    assert rendered == {"manuscript": "book.docx", "params": {"trim_size": "6x9"}}
+    # Named after the job so a retried upload overwrites instead of duplicating
+    assert uploads == [f"{job_id}.pdf"]
+    status = broker.get(job_id)
+    assert status["status"] == "done"
+    assert status["result"] == {"pdf_url": f"https://cdn/{job_id}.pdf"}
+
+
+def test_process_job_failure_requeues(broker, monkeypatch):
+    def broken_generate_pdf(**kwargs):
+        raise RuntimeError("bad manuscript")
+
+    monkeypatch.setattr(render_worker, "generate_pdf", broken_generate_pdf)
+    job_id = _enqueue(broker)
+
+    render_worker.process_job(broker, broker.claim("w1"), upload=lambda path, name: "unused")
+
+    status = broker.get(job_id)
+    assert status["status"] == "queued"
+    assert status["error"] == "bad manuscript"
+
+
+class _StopWorker(Exception):
+    pass
+
+
+class _FlakyBroker:
+    """Delegates to a real broker, but claim() raises for the first few calls."""
+
+    def __init__(self, broker, failures):
+        self.broker = broker
+        self.failures = failures
+
+    def claim(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.broker.claim(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.broker, name)
+
+
+def test_run_worker_survives_broker_errors(broker, monkeypatch):
+    monkeypatch.setattr(render_worker, "register_fonts", lambda: None)
+
+    def fake_generate_pdf(output_path, manuscript_file_path, **params):
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF")
+
+    monkeypatch.setattr(render_worker, "generate_pdf", fake_generate_pdf)
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if broker.get(job_id)["status"] == "done":
+            raise _StopWorker
+
+    monkeypatch.setattr(render_worker.time, "sleep", fake_sleep)
+    job_id = _enqueue(broker)
+
+    ready = []
+
+    with pytest.raises(_StopWorker):
+        render_worker.run_worker(
+            _FlakyBroker(broker, failures=3), upload=lambda path, name: name, poll_interval=1,
+            on_ready=lambda: ready.append(True),
+        )
+
+    assert ready == [True]
+
+    assert sleeps[:3] == [1, 2, 4]  # exponential backoff while the broker errors
+    assert broker.get(job_id)["status"] == "done"
+
+
+def test_process_job_survives_fail_error(broker, monkeypatch):
+    def broken_generate_pdf(**kwargs):
+        raise RuntimeError("bad manuscript")
+
+    def broken_fail(job, error):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(render_worker, "generate_pdf", broken_generate_pdf)
+    monkeypatch.setattr(broker, "fail", broken_fail)
+    job_id = _enqueue(broker)
+
+    render_worker.process_job(broker, broker.claim("w1"), upload=lambda path, name: "unused")
+
+    # Left running; the lease expiring hands it to another worker
+    assert broker.get(job_id)["status"] == "running"
+
+
+def test_process_job_interrupt_stops_heartbeat(broker, monkeypatch):
+    def interrupted_generate_pdf(**kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(render_worker, "generate_pdf", interrupted_generate_pdf)
+    _enqueue(broker)
+    job = broker.claim("w1")
+    raised = []
+
+    def run():
+        try:
+            render_worker.process_job(broker, job, upload=lambda path, name: "unused")
+        except KeyboardInterrupt:
+            raised.append(True)
+
+    runner = threading.Thread(target=run, daemon=True)
+    runner.start()
+    runner.join(timeout=5)
+
+    # The heartbeat waits visibility_timeout / 3 between renewals unless stopped
+    assert not runner.is_alive()
+    assert raised == [True]
@@ -2,3 +2,4 @@ from .fonts import register_fonts
 from .docx_parse import parse_docx_to_story, extract_book_title
 from .pdf_gen import generate_pdf
 from .supabase_upload import upload_pdf_to_supabase
+from .render_queue import get_broker
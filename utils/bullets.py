@@ -1,7 +1,8 @@
 # utils/bullets.py
 
-from reportlab.platypus import ListFlowable, ListItem, Paragraph
+from reportlab.platypus import ListFlowable, ListItem
 from reportlab.lib.styles import ParagraphStyle
+from .layout_cache import CachedParagraph
 
 def group_lists(docx_paragraphs):
     """
@@ -44,7 +45,7 @@ def make_list_flowable(list_items, styles, ordered=False):
             if level == current_level:
                 result.append(
                     ListItem(
-                        Paragraph(para.text, styles['body']),
+                        CachedParagraph(para.text, styles['body']),
                         leftIndent=12*(level-1)
                     )
                 )
@@ -76,5 +77,5 @@ def parse_bullet_lists(docx_paragraphs, styles):
             flowables.append(make_list_flowable(data, styles, ordered=is_ordered))
         else:  # "para"
             para = data
-            flowables.append(Paragraph(para.text, styles['body']))
+            flowables.append(CachedParagraph(para.text, styles['body']))
     return flowables
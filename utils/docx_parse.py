@@ -1,10 +1,11 @@
 import os
 from docx import Document
-from reportlab.platypus import Paragraph, Spacer
+from reportlab.platypus import Spacer
 from .bullets import parse_bullet_lists
 from .tables import parse_tables
 from .images import parse_images
 from .headings import process_heading  # NEW IMPORT
+from .layout_cache import CachedParagraph
 
 def parse_docx_to_story(docx_path, styles):
     """
@@ -73,7 +74,7 @@ def parse_docx_to_story(docx_path, styles):
                 else:
                     run_fragments.append(run_text)
             paragraph_text = ''.join(run_fragments)
-            story.append(Paragraph(paragraph_text, styles['body']))
+            story.append(CachedParagraph(paragraph_text, styles['body']))
         story.append(Spacer(1, 6))
         i += 1
 
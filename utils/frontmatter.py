@@ -1,5 +1,6 @@
-from reportlab.platypus import Paragraph, PageBreak
+from reportlab.platypus import PageBreak
 from reportlab.lib.styles import ParagraphStyle
+from .layout_cache import CachedParagraph
 
 def get_title_style(heading_font):
     return ParagraphStyle(
@@ -66,24 +67,24 @@ def build_front_matter(
     # Title Page
     if title:
         page = []
-        title_paragraph = Paragraph(title, get_title_style(heading_font))
+        title_paragraph = CachedParagraph(title, get_title_style(heading_font))
         page.append(title_paragraph)
         if subtitle:
-            subtitle_paragraph = Paragraph(subtitle, get_subtitle_style(heading_font))
+            subtitle_paragraph = CachedParagraph(subtitle, get_subtitle_style(heading_font))
             page.append(subtitle_paragraph)
         if author:
-            author_paragraph = Paragraph(f"by {author}", get_author_style(heading_font))
+            author_paragraph = CachedParagraph(f"by {author}", get_author_style(heading_font))
             page.append(author_paragraph)
         pages += page + [PageBreak()]
 
     # Dedication Page
     if dedication:
-        dedication_paragraph = Paragraph(dedication, get_dedication_style(body_font))
+        dedication_paragraph = CachedParagraph(dedication, get_dedication_style(body_font))
         pages += [dedication_paragraph, PageBreak()]
 
     # Copyright Page
     if copyright_text:
-        copyright_paragraph = Paragraph(copyright_text, get_copyright_style(body_font))
+        copyright_paragraph = CachedParagraph(copyright_text, get_copyright_style(body_font))
         pages += [copyright_paragraph, PageBreak()]
 
     return pages
@@ -1,6 +1,7 @@
 # utils/headings.py
 
-from reportlab.platypus import Paragraph, Spacer
+from reportlab.platypus import Spacer
+from .layout_cache import CachedParagraph
 
 def map_heading_style(level, styles):
     """
@@ -19,6 +20,6 @@ def process_heading(text, level, styles):
     # More spacing for top-level headings, less for sub-headings
     spacing = max(18 - (level-1)*4, 8)
     return [
-        Paragraph(text, style),
+        CachedParagraph(text, style),
         Spacer(1, spacing)
     ]
@@ -0,0 +1,336 @@
+# utils/layout_cache.py
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from reportlab import Version as REPORTLAB_VERSION
+from reportlab.platypus import Paragraph
+
+DEFAULT_MAX_MB = 64
+DEFAULT_DISK_MAX_MB = 512
+
+# Bump when the shape of cached entries changes so stale disk entries are ignored
+LAYOUT_FORMAT = 2
+
+# Paragraph attributes breakLines() sets besides its return value
+_LAYOUT_ATTRS = ("frags", "_width_max", "_splitLongWordCount", "_hyphenations")
+
+# Style attributes that never influence line breaking
+_IGNORED_STYLE_ATTRS = ("name", "parent")
+
+
+def style_signature(style):
+    """
+    Returns a stable digest of every layout-relevant attribute of a ParagraphStyle,
+    so two styles built by get_styles() with the same fonts/sizes hash the same.
+    """
+    items = sorted(
+        (k, repr(v)) for k, v in style.__dict__.items() if k not in _IGNORED_STYLE_ATTRS
+    )
+    return hashlib.sha1(repr(items).encode("utf8")).hexdigest()
+
+
+class LayoutCache:
+    """
+    LRU cache of Paragraph line-breaking results (ReportLab "blPara" structures
+    plus the paragraph state breakLines() leaves behind).
+    Entries are stored pickled, so every hit hands back a private copy and the
+    memory budget is measured in real bytes. If disk_dir is given, entries are
+    also written there and survive process restarts; that tier is capped at
+    disk_max_bytes, evicting the least recently used files (by mtime).
+
+    disk_dir is unpickled on read, so it must be private to this service.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, disk_dir=None,
+                 disk_max_bytes=DEFAULT_DISK_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_size = 0
+        if disk_dir:
+            os.makedirs(disk_dir, mode=0o700, exist_ok=True)
+            self._disk_size = sum(size for _, _, size in self._disk_files())
+        self._entries = OrderedDict()  # key -> (pickled layout, seconds it took to compute)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compute_seconds = 0.0   # line-breaking done on misses
+        self.avoided_seconds = 0.0   # line-breaking skipped thanks to hits
+        self.overhead_seconds = 0.0  # keying, (un)pickling and disk I/O, hits and misses alike
+
+    def make_key(self, source, style, widths):
+        """
+        Key = (paragraph markup hash, style signature, available widths).
+        """
+        raw = "|".join([
+            REPORTLAB_VERSION,
+            str(LAYOUT_FORMAT),
+            hashlib.sha1(source.encode("utf8")).hexdigest(),
+            style_signature(style),
+            repr(tuple(widths)),
+        ])
+        return hashlib.sha1(raw.encode("utf8")).hexdigest()
+
+    def get(self, key):
+        """Returns a fresh copy of the cached layout, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, entry)
+        if entry is None:
+            return None
+        blob, cost = entry
+        layout = pickle.loads(blob)
+        with self._lock:
+            self.hits += 1
+            self.avoided_seconds += cost
+        return layout
+
+    def put(self, key, layout, cost):
+        """Stores a freshly computed layout along with the time it took to build."""
+        try:
+            blob = pickle.dumps(layout, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Paragraphs holding callbacks/images can't be cached; just skip them
+            return
+        entry = (blob, cost)
+        with self._lock:
+            self.misses += 1
+            self.compute_seconds += cost
+            self._store(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def add_overhead(self, seconds):
+        """Records time spent on cache bookkeeping rather than line-breaking."""
+        with self._lock:
+            self.overhead_seconds += seconds
+
+    def _store(self, key, entry):
+        # Caller must hold self._lock
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old[0])
+        self._entries[key] = entry
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted[0])
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(path)  # mtime doubles as the disk tier's LRU clock
+            return entry
+        except Exception:
+            return None
+
+    def _write_disk(self, key, entry):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Could not persist layout cache entry: {e}")
+            return
+        with self._lock:
+            self._disk_size += os.path.getsize(path)
+            over_budget = self._disk_size > self.disk_max_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _disk_files(self):
+        """(mtime, path, size) for every cache file in disk_dir."""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".pkl"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue  # removed by another process meanwhile
+            files.append((st.st_mtime, entry.path, st.st_size))
+        return files
+
+    def _prune_disk(self):
+        """
+        Deletes least recently used files until the tier is at 90% of its budget.
+        Rescans the directory, since other processes may share it.
+        """
+        files = sorted(self._disk_files())
+        total = sum(size for _, _, size in files)
+        target = self.disk_max_bytes * 0.9
+        for _, path, size in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_size = total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Returns a dict with entry count, memory use, hit rate and time accounting.
+        saved_seconds is net: line-breaking avoided minus all cache overhead,
+        so it goes negative when the cache costs more than it saves.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "compute_seconds": self.compute_seconds,
+                "avoided_seconds": self.avoided_seconds,
+                "overhead_seconds": self.overhead_seconds,
+                "saved_seconds": self.avoided_seconds - self.overhead_seconds,
+            }
+
+
+_layout_cache = None
+_layout_cache_configured = False
+_layout_cache_lock = threading.Lock()
+
+
+def _env_mb(name, default):
+    """Reads a size in MB from the environment, falling back to default if malformed."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        print(f"⚠️ Invalid {name}={raw!r}; using default of {default} MB")
+        return default
+
+
+def get_layout_cache():
+    """
+    Returns the process-wide LayoutCache, or None when disabled.
+    Configured via env: LAYOUT_CACHE_MAX_MB (0 disables), LAYOUT_CACHE_DIR and
+    LAYOUT_CACHE_DISK_MAX_MB, read once on first use. LAYOUT_CACHE_DIR must only
+    be writable by this service: its files are unpickled.
+    """
+    global _layout_cache, _layout_cache_configured
+    if not _layout_cache_configured:
+        with _layout_cache_lock:
+            if not _layout_cache_configured:
+                max_mb = _env_mb("LAYOUT_CACHE_MAX_MB", DEFAULT_MAX_MB)
+                if max_mb > 0:
+                    _layout_cache = LayoutCache(
+                        max_bytes=int(max_mb * 1024 * 1024),
+                        disk_dir=os.getenv("LAYOUT_CACHE_DIR") or None,
+                        disk_max_bytes=int(
+                            _env_mb("LAYOUT_CACHE_DISK_MAX_MB", DEFAULT_DISK_MAX_MB) * 1024 * 1024
+                        ),
+                    )
+                _layout_cache_configured = True
+    return _layout_cache
+
+
+def format_cache_report(before, after):
+    """
+    Human-readable summary of the cache activity between two stats() snapshots.
+    """
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    lookups = hits + misses
+    hit_rate = (hits / lookups * 100) if lookups else 0.0
+    avoided = after["avoided_seconds"] - before["avoided_seconds"]
+    overhead = after["overhead_seconds"] - before["overhead_seconds"]
+    return (
+        f"📐 Layout cache: {hits}/{lookups} hits ({hit_rate:.1f}%), "
+        f"net {avoided - overhead:+.3f}s ({avoided:.3f}s line-breaking avoided, "
+        f"{overhead:.3f}s cache overhead), "
+        f"{after['entries']} entries / {after['bytes'] / (1024 * 1024):.1f} MB"
+    )
+
+
+class CachedParagraph(Paragraph):
+    """
+    Drop-in Paragraph whose line-breaking is memoized in the shared LayoutCache.
+    Halves produced by split() are keyed off their parent, so page-boundary
+    paragraphs are cached too.
+    """
+
+    def __init__(self, text, style=None, bulletText=None, frags=None, caseSensitive=1, encoding='utf8'):
+        Paragraph.__init__(self, text, style, bulletText=bulletText, frags=frags,
+                           caseSensitive=caseSensitive, encoding=encoding)
+        # Split halves are built from frags; split() assigns their source afterwards
+        self._layout_source = f"{text}\x00{self.bulletText!r}" if frags is None else None
+
+    def breakLines(self, width):
+        cache = get_layout_cache()
+        if cache is None or self._layout_source is None:
+            return Paragraph.breakLines(self, width)
+        started = time.perf_counter()
+        key = cache.make_key(self._layout_source, self.style, width)
+        layout = cache.get(key)
+        if layout is not None:
+            # Restore what breakLines() would have set, e.g. the processed word
+            # list in self.frags that split() relies on to pick its strategy
+            blPara, state = layout
+            for attr, value in state.items():
+                setattr(self, attr, value)
+            cache.add_overhead(time.perf_counter() - started)
+            return blPara
+        compute_started = time.perf_counter()
+        blPara = Paragraph.breakLines(self, width)
+        cost = time.perf_counter() - compute_started
+        state = {attr: getattr(self, attr) for attr in _LAYOUT_ATTRS if hasattr(self, attr)}
+        # Pickled together so blPara and frags keep sharing their word objects
+        cache.put(key, (blPara, state), cost)
+        # Everything but the line-breaking itself: keying, the failed lookup, pickling, disk
+        cache.add_overhead(time.perf_counter() - started - cost)
+        return blPara
+
+    def split(self, availWidth, availHeight):
+        parts = Paragraph.split(self, availWidth, availHeight)
+        if len(parts) == 2 and self._layout_source is not None:
+            head_lines = len(parts[0].blPara.lines)
+            widths = repr(tuple(self._wrapWidths))
+            for part, label in zip(parts, ("head", "tail")):
+                if isinstance(part, CachedParagraph):
+                    part._layout_source = f"{self._layout_source}\x00{label}:{head_lines}:{widths}"
+        return parts
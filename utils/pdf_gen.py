@@ -5,6 +5,8 @@ from utils.styles import get_styles
 from utils.margins import get_margin_tuple
 from utils.toc import build_static_toc
 from utils.frontmatter import build_front_matter  # <--- new import!
+from utils.layout_cache import get_layout_cache, format_cache_report
+from utils.pdf_optimize import optimize_pdf, format_optimize_report
 
 TRIM_SIZE_MAP = {
     "6x9": (6 * inch, 9 * inch),
@@ -68,8 +70,13 @@ def generate_pdf(
     author_name="",           # New: from frontend
     dedication="",            # New: from frontend
     copyright_notice="",      # New: from frontend
-
+    optimize_output=True,     # Post-process: object streams + resource dedup
+    linearize=True,           # Fast web view (first page before full download)
 ):
+    # Snapshot layout cache counters so we can report this build's hit rate
+    layout_cache = get_layout_cache()
+    cache_stats_before = layout_cache.stats() if layout_cache else None
+
     # --- TRIM SIZE LOGIC ---
     key = clean_trim_size(trim_size)
     width, height = TRIM_SIZE_MAP.get(key, (6 * inch, 9 * inch))
@@ -121,3 +128,14 @@ def generate_pdf(
 
     full_story = front_matter_pages + story
     doc.build(full_story)
+
+    if layout_cache:
+        print(format_cache_report(cache_stats_before, layout_cache.stats()))
+
+    # --- Output post-processing ---
+    if optimize_output:
+        report = optimize_pdf(output_path, linearize=linearize)
+        if report:
+            print(format_optimize_report(report))
+        return report
+    return None
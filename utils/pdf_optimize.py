@@ -0,0 +1,205 @@
+# utils/pdf_optimize.py
+
+import hashlib
+import os
+import time
+
+import pikepdf
+
+
+def _stream_size(obj):
+    try:
+        return len(obj.read_raw_bytes())
+    except Exception:
+        return 0
+
+
+def pdf_size_breakdown(pdf):
+    """
+    Splits the stream bytes of an open pikepdf.Pdf into fonts, images and page content.
+    Returns: dict with 'fonts', 'images', 'content' and 'other' (bytes).
+    """
+    fonts, images, content = set(), set(), set()
+    for page in pdf.pages:
+        contents = page.obj.get("/Contents")
+        if isinstance(contents, pikepdf.Array):
+            content.update(c.objgen for c in contents)
+        elif contents is not None:
+            content.add(contents.objgen)
+
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Dictionary) and not isinstance(obj, pikepdf.Stream):
+            continue
+        if obj.get("/Type") == "/FontDescriptor":
+            for key in ("/FontFile", "/FontFile2", "/FontFile3"):
+                if key in obj:
+                    fonts.add(obj[key].objgen)
+        elif isinstance(obj, pikepdf.Stream) and obj.get("/Subtype") == "/Image":
+            images.add(obj.objgen)
+
+    breakdown = {"fonts": 0, "images": 0, "content": 0, "other": 0}
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Stream):
+            continue
+        size = _stream_size(obj)
+        if obj.objgen in fonts:
+            breakdown["fonts"] += size
+        elif obj.objgen in images:
+            breakdown["images"] += size
+        elif obj.objgen in content:
+            breakdown["content"] += size
+        else:
+            breakdown["other"] += size
+    return breakdown
+
+
+def _hash_object(h, obj, visited):
+    """
+    Feeds obj into h, following indirect references so that two streams pointing
+    at different objects (e.g. /SMask, /DecodeParms) never hash the same.
+    """
+    if getattr(obj, "is_indirect", False):
+        seen = visited.get(obj.objgen)
+        if seen is not None:
+            # Already hashed (or a cycle): record which one, not its contents again
+            h.update(f"@{seen};".encode("utf8"))
+            return
+        visited[obj.objgen] = len(visited)
+    if isinstance(obj, pikepdf.Stream):
+        h.update(b"stream:")
+        h.update(hashlib.sha1(obj.read_raw_bytes()).digest())
+        _hash_dictionary(h, obj, visited, skip=("/Length",))
+    elif isinstance(obj, pikepdf.Dictionary):
+        _hash_dictionary(h, obj, visited)
+    elif isinstance(obj, pikepdf.Array):
+        h.update(b"[")
+        for item in obj:
+            _hash_object(h, item, visited)
+        h.update(b"]")
+    else:
+        h.update(f"{type(obj).__name__}:{obj!r};".encode("utf8"))
+
+
+def _hash_dictionary(h, obj, visited, skip=()):
+    h.update(b"<<")
+    for key in sorted(k for k in obj.keys() if k not in skip):
+        h.update(key.encode("utf8"))
+        _hash_object(h, obj[key], visited)
+    h.update(b">>")
+
+
+def _stream_digest(stream):
+    """Hash of a stream's raw bytes plus everything its dictionary references (minus /Length)."""
+    h = hashlib.sha1()
+    _hash_object(h, stream, {})
+    return h.hexdigest()
+
+
+def deduplicate_resources(pdf):
+    """
+    Points page XObjects (images/forms) with identical data at a single object.
+    Returns the number of references rewritten; the orphans are dropped on save.
+    """
+    canonical = {}
+    rewritten = 0
+    for page in pdf.pages:
+        resources = page.obj.get("/Resources")
+        xobjects = resources.get("/XObject") if resources is not None else None
+        if xobjects is None:
+            continue
+        for name in list(xobjects.keys()):
+            obj = xobjects[name]
+            if not isinstance(obj, pikepdf.Stream):
+                continue
+            first = canonical.setdefault(_stream_digest(obj), obj)
+            if first.objgen != obj.objgen:
+                xobjects[name] = first
+                rewritten += 1
+    return rewritten
+
+
+def optimize_pdf(pdf_path, linearize=True, object_streams=True, deduplicate=True):
+    """
+    Rewrites pdf_path in place: compressed object streams, deduplicated resources
+    and (optionally) linearized for fast web view.
+    Returns a report dict with sizes, size breakdown, first-page bytes and timing,
+    or None if optimization failed (pdf_path is then left untouched). If only the
+    optimized file can't be inspected, 'after' and 'first_page_bytes' are None.
+    """
+    started = time.perf_counter()
+    original_size = os.path.getsize(pdf_path)
+    tmp_path = f"{pdf_path}.opt"
+
+    try:
+        with pikepdf.open(pdf_path) as pdf:
+            before = pdf_size_breakdown(pdf)
+            rewritten = deduplicate_resources(pdf) if deduplicate else 0
+            pdf.save(
+                tmp_path,
+                compress_streams=True,
+                object_stream_mode=(
+                    pikepdf.ObjectStreamMode.generate if object_streams
+                    else pikepdf.ObjectStreamMode.preserve
+                ),
+                linearize=linearize,
+            )
+        os.replace(tmp_path, pdf_path)
+    except Exception as e:
+        # Optimization is optional; ship the unoptimized PDF rather than fail the request
+        print(f"⚠️ PDF optimization failed, keeping original output: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    try:
+        with pikepdf.open(pdf_path) as pdf:
+            after = pdf_size_breakdown(pdf)
+            first_page_bytes = _first_page_bytes(pdf, pdf_path)
+    except Exception as e:
+        # The optimized file is already in place; only the stats are missing
+        print(f"⚠️ Could not inspect optimized PDF: {e}")
+        after, first_page_bytes = None, None
+
+    return {
+        "original_bytes": original_size,
+        "optimized_bytes": os.path.getsize(pdf_path),
+        "before": before,
+        "after": after,
+        "deduplicated_refs": rewritten,
+        "linearized": linearize,
+        "first_page_bytes": first_page_bytes,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _first_page_bytes(pdf, pdf_path):
+    """
+    Bytes a viewer must fetch before it can draw page one: the linearization
+    dictionary's /E offset when linearized, otherwise the whole file.
+    """
+    if pdf.is_linearized:
+        for obj in pdf.objects:
+            if isinstance(obj, pikepdf.Dictionary) and "/Linearized" in obj:
+                return int(obj["/E"])
+    return os.path.getsize(pdf_path)
+
+
+def format_optimize_report(report):
+    """
+    Human-readable summary of an optimize_pdf() report.
+    """
+    kb = lambda n: f"{n / 1024:.1f} KB"
+    after = report["after"]
+    saved = report["original_bytes"] - report["optimized_bytes"]
+    summary = (
+        f"🗜️ PDF optimized in {report['seconds']:.2f}s: "
+        f"{kb(report['original_bytes'])} -> {kb(report['optimized_bytes'])} ({kb(saved)} saved)"
+    )
+    if after is None:
+        return f"{summary}; breakdown unavailable"
+    return (
+        f"{summary}; "
+        f"fonts {kb(after['fonts'])}, images {kb(after['images'])}, "
+        f"content {kb(after['content'])}, other {kb(after['other'])}; "
+        f"first page after {kb(report['first_page_bytes'])}"
+    )
@@ -0,0 +1,404 @@
+# utils/render_queue.py
+
+import abc
+import contextlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+import redis
+
+DEFAULT_VISIBILITY_TIMEOUT = 300  # seconds a claimed job stays invisible to other workers
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 5  # seconds, multiplied by the attempt number
+
+
+class RenderJob:
+    """
+    A claimed job. `lease` identifies this particular claim; completing or
+    failing with a stale lease (the job timed out and was re-claimed) is a no-op.
+    """
+
+    def __init__(self, job_id, payload, attempts, lease):
+        self.id = job_id
+        self.payload = payload
+        self.attempts = attempts
+        self.lease = lease
+
+    def __repr__(self):
+        return f"RenderJob(id={self.id!r}, attempts={self.attempts})"
+
+
+class RenderBroker(abc.ABC):
+    """
+    Interface every broker backend implements. Job states:
+    queued -> running -> done | (queued again on retry) | failed
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, payload, job_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Adds a job and returns its id. Re-enqueueing an existing id is a no-op."""
+        ...
+
+    @abc.abstractmethod
+    def claim(self, worker_id, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        """Returns the next available RenderJob (leased to worker_id), or None."""
+        ...
+
+    @abc.abstractmethod
+    def extend(self, job, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        """Pushes the lease deadline out; returns False if the lease was lost."""
+        ...
+
+    @abc.abstractmethod
+    def complete(self, job, result):
+        """Marks the job done with `result`; returns False if already done or lease lost."""
+        ...
+
+    @abc.abstractmethod
+    def fail(self, job, error):
+        """Requeues the job with backoff, or marks it failed once attempts are used up."""
+        ...
+
+    @abc.abstractmethod
+    def get(self, job_id):
+        """Returns a status dict for job_id, or None if unknown."""
+        ...
+
+
+class SQLiteBroker(RenderBroker):
+    """
+    Broker backed by a single SQLite file, for tests and single-host setups.
+    WAL mode needs shared memory, so every API and worker process must be on the
+    same host with the file on local disk (not NFS/SMB). Use RedisBroker across nodes.
+    """
+
+    @classmethod
+    def from_url(cls, url):
+        return cls(url.partition("://")[2])
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS render_jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease TEXT,
+                    worker_id TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS render_jobs_ready ON render_jobs (status, available_at)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One autocommit connection per call keeps this safe across threads and forks
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, payload, job_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO render_jobs "
+                "(id, payload, status, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), max_attempts, now, now, now),
+            )
+        return job_id
+
+    def claim(self, worker_id, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        now = time.time()
+        with self._connect() as conn:
+            # Take the write lock up front so two workers can't claim the same row
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Leases that ran out on their last attempt are given up on
+                conn.execute(
+                    "UPDATE render_jobs SET status = 'failed', lease = NULL, "
+                    "error = COALESCE(error, 'visibility timeout exceeded'), updated_at = ? "
+                    "WHERE status = 'running' AND available_at <= ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                row = conn.execute(
+                    "SELECT id, payload, attempts FROM render_jobs "
+                    "WHERE status IN ('queued', 'running') AND available_at <= ? "
+                    "ORDER BY available_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                lease = uuid.uuid4().hex
+                attempts = row["attempts"] + 1
+                conn.execute(
+                    "UPDATE render_jobs SET status = 'running', attempts = ?, lease = ?, "
+                    "worker_id = ?, available_at = ?, updated_at = ? WHERE id = ?",
+                    (attempts, lease, worker_id, now + visibility_timeout, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return RenderJob(row["id"], json.loads(row["payload"]), attempts, lease)
+
+    def _update_leased(self, job, sql, params):
+        with self._connect() as conn:
+            cur = conn.execute(
+                sql + " WHERE id = ? AND lease = ? AND status = 'running'",
+                params + (job.id, job.lease),
+            )
+            return cur.rowcount == 1
+
+    def extend(self, job, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        now = time.time()
+        return self._update_leased(
+            job, "UPDATE render_jobs SET available_at = ?, updated_at = ?",
+            (now + visibility_timeout, now),
+        )
+
+    def complete(self, job, result):
+        return self._update_leased(
+            job, "UPDATE render_jobs SET status = 'done', result = ?, lease = NULL, updated_at = ?",
+            (json.dumps(result), time.time()),
+        )
+
+    def fail(self, job, error):
+        now = time.time()
+        if job.attempts >= self._max_attempts(job.id):
+            return self._update_leased(
+                job, "UPDATE render_jobs SET status = 'failed', error = ?, lease = NULL, updated_at = ?",
+                (str(error), now),
+            )
+        return self._update_leased(
+            job,
+            "UPDATE render_jobs SET status = 'queued', error = ?, lease = NULL, "
+            "available_at = ?, updated_at = ?",
+            (str(error), now + RETRY_BACKOFF * job.attempts, now),
+        )
+
+    def _max_attempts(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT max_attempts FROM render_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return row["max_attempts"] if row else DEFAULT_MAX_ATTEMPTS
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, attempts, result, error, created_at, updated_at "
+                "FROM render_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+
+# Every lease check and state transition runs as one Lua script, so it is atomic
+# on the Redis server no matter how many nodes are talking to it.
+_REDIS_ENQUEUE = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], 'payload', ARGV[2], 'status', 'queued', 'attempts', 0,
+           'max_attempts', ARGV[3], 'created_at', ARGV[4], 'updated_at', ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+return 1
+"""
+
+_REDIS_CLAIM = """
+local now = tonumber(ARGV[1])
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    local job = ARGV[5] .. id
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', job, 'lease')
+    redis.call('HSET', job, 'updated_at', ARGV[1])
+    if tonumber(redis.call('HGET', job, 'attempts')) >= tonumber(redis.call('HGET', job, 'max_attempts')) then
+        redis.call('HSET', job, 'status', 'failed')
+        redis.call('HSETNX', job, 'error', 'visibility timeout exceeded')
+    else
+        redis.call('HSET', job, 'status', 'queued')
+        redis.call('ZADD', KEYS[1], now, id)
+    end
+end
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, 1)
+if #ids == 0 then return false end
+local id = ids[1]
+local job = ARGV[5] .. id
+redis.call('ZREM', KEYS[1], id)
+local attempts = redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('HSET', job, 'status', 'running', 'lease', ARGV[3], 'worker_id', ARGV[4], 'updated_at', ARGV[1])
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), id)
+return {id, redis.call('HGET', job, 'payload'), attempts}
+"""
+
+# Shared prelude: bail out unless the caller still holds the lease
+_REDIS_LEASE_CHECK = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'running'
+        or redis.call('HGET', KEYS[1], 'lease') ~= ARGV[1] then
+    return 0
+end
+"""
+
+_REDIS_EXTEND = _REDIS_LEASE_CHECK + """
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+redis.call('HSET', KEYS[1], 'updated_at', ARGV[4])
+return 1
+"""
+
+_REDIS_COMPLETE = _REDIS_LEASE_CHECK + """
+redis.call('ZREM', KEYS[2], ARGV[2])
+redis.call('HDEL', KEYS[1], 'lease')
+redis.call('HSET', KEYS[1], 'status', 'done', 'result', ARGV[3], 'updated_at', ARGV[4])
+return 1
+"""
+
+_REDIS_FAIL = _REDIS_LEASE_CHECK + """
+local now = tonumber(ARGV[4])
+local attempts = tonumber(redis.call('HGET', KEYS[1], 'attempts'))
+redis.call('ZREM', KEYS[2], ARGV[2])
+redis.call('HDEL', KEYS[1], 'lease')
+redis.call('HSET', KEYS[1], 'error', ARGV[3], 'updated_at', ARGV[4])
+if attempts >= tonumber(redis.call('HGET', KEYS[1], 'max_attempts')) then
+    redis.call('HSET', KEYS[1], 'status', 'failed')
+else
+    redis.call('HSET', KEYS[1], 'status', 'queued')
+    redis.call('ZADD', KEYS[3], now + tonumber(ARGV[5]) * attempts, ARGV[2])
+end
+return 1
+"""
+
+
+class RedisBroker(RenderBroker):
+    """
+    Broker backed by Redis, for running API nodes and render workers on
+    different hosts. Each job is a hash; queued ids sit in a sorted set scored
+    by when they become available, leased ids in one scored by lease deadline.
+    Scripts touch per-job keys directly, so use a standalone/Sentinel Redis,
+    not Cluster. Deadlines use the callers' clocks, so keep nodes NTP-synced.
+    """
+
+    def __init__(self, client, prefix="kdp:render:"):
+        # client must be created with decode_responses=True
+        self.client = client
+        self.prefix = prefix
+        self._ready_key = f"{prefix}ready"
+        self._leased_key = f"{prefix}leased"
+        self._job_prefix = f"{prefix}job:"
+        self._enqueue = client.register_script(_REDIS_ENQUEUE)
+        self._claim = client.register_script(_REDIS_CLAIM)
+        self._extend = client.register_script(_REDIS_EXTEND)
+        self._complete = client.register_script(_REDIS_COMPLETE)
+        self._fail = client.register_script(_REDIS_FAIL)
+
+    @classmethod
+    def from_url(cls, url):
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def _job_key(self, job_id):
+        return f"{self._job_prefix}{job_id}"
+
+    def enqueue(self, payload, job_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        job_id = job_id or str(uuid.uuid4())
+        self._enqueue(
+            keys=[self._job_key(job_id), self._ready_key],
+            args=[job_id, json.dumps(payload), max_attempts, repr(time.time())],
+        )
+        return job_id
+
+    def claim(self, worker_id, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        lease = uuid.uuid4().hex
+        claimed = self._claim(
+            keys=[self._ready_key, self._leased_key],
+            args=[repr(time.time()), visibility_timeout, lease, worker_id, self._job_prefix],
+        )
+        if not claimed:
+            return None
+        job_id, payload, attempts = claimed
+        return RenderJob(job_id, json.loads(payload), int(attempts), lease)
+
+    def extend(self, job, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        now = time.time()
+        return bool(self._extend(
+            keys=[self._job_key(job.id), self._leased_key],
+            args=[job.lease, job.id, repr(now + visibility_timeout), repr(now)],
+        ))
+
+    def complete(self, job, result):
+        return bool(self._complete(
+            keys=[self._job_key(job.id), self._leased_key],
+            args=[job.lease, job.id, json.dumps(result), repr(time.time())],
+        ))
+
+    def fail(self, job, error):
+        return bool(self._fail(
+            keys=[self._job_key(job.id), self._leased_key, self._ready_key],
+            args=[job.lease, job.id, str(error), repr(time.time()), RETRY_BACKOFF],
+        ))
+
+    def get(self, job_id):
+        job = self.client.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "attempts": int(job["attempts"]),
+            "result": json.loads(job["result"]) if job.get("result") else None,
+            "error": job.get("error"),
+            "created_at": float(job["created_at"]),
+            "updated_at": float(job["updated_at"]),
+        }
+
+
+# URL scheme -> factory(url). Register other backends (SQS, Postgres, ...) here.
+BROKER_BACKENDS = {
+    "sqlite": SQLiteBroker.from_url,
+    "redis": RedisBroker.from_url,
+    "rediss": RedisBroker.from_url,
+}
+
+
+def get_broker(url=None):
+    """
+    Builds a broker from a URL such as 'redis://queue-host:6379/0' (multi-node)
+    or 'sqlite:///var/kdp/queue.db' (single host / tests).
+    Defaults to the RENDER_BROKER_URL env var; returns None when unset (inline mode).
+    """
+    url = url or os.getenv("RENDER_BROKER_URL")
+    if not url:
+        return None
+    scheme, sep, _ = url.partition("://")
+    if not sep or scheme not in BROKER_BACKENDS:
+        raise ValueError(f"Unsupported render broker URL: {url}")
+    return BROKER_BACKENDS[scheme](url)